@@ -1,7 +1,50 @@
 # model_averaging_tool/analysis.py
 
+import math
 import pandas as pd
 import numpy as np
+from .constants import CI_MULTIPLIER
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+if njit is not None:
+    @njit(cache=True)
+    def wavg_wstd_by_group(grp_ids, x, w, ngroups):
+        """
+        Weighted average and weighted standard deviation of 'xDecompAgg' per group.
+        
+        Parameters:
+        - grp_ids (ndarray): Group id of each row (negative ids are skipped).
+        - x (ndarray): Decomposed effect values.
+        - w (ndarray): Weights.
+        - ngroups (int): Number of groups.
+        
+        Returns:
+        - tuple: (wtd_avg_x, wtd_std_x) arrays of length ngroups.
+        """
+        sw = np.zeros(ngroups)
+        swx = np.zeros(ngroups)
+        for i in range(grp_ids.shape[0]):
+            g = grp_ids[i]
+            if g < 0:
+                continue
+            sw[g] += w[i]
+            swx[g] += w[i] * x[i]
+        mu_x = swx / sw
+        
+        # Second pass around the group means, avoiding the cancellation in E[x^2] - mean^2
+        var_x = np.zeros(ngroups)
+        for i in range(grp_ids.shape[0]):
+            g = grp_ids[i]
+            if g < 0:
+                continue
+            dx = x[i] - mu_x[g]
+            var_x[g] += w[i] * dx * dx
+        var_x /= sw
+        return mu_x, np.sqrt(var_x)
 
 def calculate_weights(pareto_aggregated):
     """
@@ -16,15 +59,20 @@ def calculate_weights(pareto_aggregated):
     # Extract necessary columns and drop duplicate rows
     pareto_unique = pareto_aggregated[['solID', 'rsq_train', 'nrmse']].drop_duplicates()
     
-    # Calculate 'inverse_nrmse'
-    pareto_unique['inverse_nrmse'] = 1 / pareto_unique['nrmse']
-    
-    # Calculate 'weights'
-    pareto_unique['weights'] = pareto_unique['inverse_nrmse'] / pareto_unique['inverse_nrmse'].sum()
-    
-    return pareto_unique
+    # Calculate 'inverse_nrmse' and 'weights'
+    nrmse = pareto_unique['nrmse'].to_numpy(dtype=np.float64)
+    inverse_nrmse = np.reciprocal(nrmse)
+    weights = inverse_nrmse / inverse_nrmse.sum()
+    
+    return pd.DataFrame({
+        'solID': pareto_unique['solID'].to_numpy(),
+        'rsq_train': pareto_unique['rsq_train'].to_numpy(),
+        'nrmse': nrmse,
+        'inverse_nrmse': inverse_nrmse,
+        'weights': weights
+    }, index=pareto_unique.index, copy=False)
 
-def compute_contributions(decomp_table, total_spend_df, sample_size):
+def compute_contributions(decomp_table, total_spend_df, sample_size, return_totals=False):
     """
     Compute weighted average, standard deviation, and confidence intervals for decomposed effects.
     
@@ -32,104 +80,174 @@ def compute_contributions(decomp_table, total_spend_df, sample_size):
     - decomp_table (DataFrame): Decomposed effects data.
     - total_spend_df (DataFrame): Total spend data.
     - sample_size (int): Sample size of the data.
+    - return_totals (bool): Also return the column totals used for the shares. Default is False.
     
     Returns:
     - DataFrame: Table with computed contributions and confidence intervals.
+    - dict: Totals of 'wtd_avg', 'ci95_lo' and 'ci95_hi' (only if return_totals is True).
     """
-    # Calculate weighted average and weighted standard deviation for 'coef'
-    df_coef = decomp_table.groupby('rn').apply(lambda x: pd.Series({
-        'wtd_avg': np.average(x['coef'], weights=x['weights']),
-        'wtd_stddev': np.sqrt(np.average((x['coef'] - np.average(x['coef'], weights=x['weights']))**2, weights=x['weights']))
-    })).sort_index()
-    
-    # Calculate weighted average and weighted standard deviation for 'xDecompAgg'
-    df_xDecompAgg = decomp_table.groupby('rn').apply(lambda x: pd.Series({
-        'wtd_avg': np.average(x['xDecompAgg'], weights=x['weights']),
-        'wtd_stddev': np.sqrt(np.average((x['xDecompAgg'] - np.average(x['xDecompAgg'], weights=x['weights']))**2, weights=x['weights']))
-    })).sort_index()
+    w = decomp_table['weights'].to_numpy(dtype=np.float64)
+    x_decomp = decomp_table['xDecompAgg'].to_numpy(dtype=np.float64)
+    
+    if njit is not None:
+        # Single pass over the rows with the compiled kernel
+        grp_ids, rn_values = pd.factorize(decomp_table['rn'], sort=True)
+        x_avg, x_std = wavg_wstd_by_group(grp_ids, x_decomp, w, len(rn_values))
+        rn_index = pd.Index(rn_values, name='rn')
+    else:
+        # Weighted sums for 'xDecompAgg' in a single groupby-sum, counting NaN rows
+        # so they propagate like in np.average instead of being skipped by sum()
+        w_x = w * x_decomp
+        helper = pd.DataFrame({
+            'rn': decomp_table['rn'].values,
+            'w': w,
+            'w_x': w_x,
+            'n_nan': np.isnan(w_x)
+        }, copy=False)
+        sums = helper.groupby('rn', sort=False, observed=True)[['w', 'w_x', 'n_nan']].sum()
+        
+        # Order the variables once, on the aggregated result
+        sums = sums.sort_index()
+        sum_w = sums['w'].to_numpy()
+        has_nan = sums['n_nan'].to_numpy() > 0
+        x_avg = sums['w_x'].to_numpy() / sum_w
+        x_avg[has_nan] = np.nan
+        
+        # Weighted standard deviation around each variable's mean, avoiding the
+        # cancellation in E[x^2] - mean^2
+        row_avg = helper['rn'].map(pd.Series(x_avg, index=sums.index)).to_numpy(dtype=np.float64)
+        helper['w_dev2'] = w * (x_decomp - row_avg)**2
+        sum_w_dev2 = helper.groupby('rn', sort=False, observed=True)['w_dev2'].sum().reindex(sums.index)
+        x_std = np.sqrt(sum_w_dev2.to_numpy() / sum_w)
+        x_std[has_nan] = np.nan
+        rn_index = sums.index
     
     # Calculate the 95% confidence interval for the weighted average
-    df_xDecompAgg['ci95_lo'] = df_xDecompAgg['wtd_avg'] - (1.96 * df_xDecompAgg['wtd_stddev'] / np.sqrt(sample_size))
-    df_xDecompAgg['ci95_hi'] = df_xDecompAgg['wtd_avg'] + (1.96 * df_xDecompAgg['wtd_stddev'] / np.sqrt(sample_size))
-    
-    # Merge with spend totals
-    decompplusspend_table = pd.merge(df_xDecompAgg, total_spend_df, on='rn', how='left')
-    
-    # Replace NaN in 'Total Spend' with 0
-    decompplusspend_table['Total Spend'].fillna(0, inplace=True)
-    
-    # Calculate totals for weighted average, ci95_lo, and ci95_hi
-    total_wtd_avg = decompplusspend_table['wtd_avg'].sum()
-    total_ci95_lo = decompplusspend_table['ci95_lo'].sum()
-    total_ci95_hi = decompplusspend_table['ci95_hi'].sum()
-    
-    # Calculate the share of each variable
-    decompplusspend_table['wtd_avg_share'] = (decompplusspend_table['wtd_avg'] / total_wtd_avg) * 100
-    decompplusspend_table['ci95_lo_share'] = (decompplusspend_table['ci95_lo'] / total_ci95_lo) * 100
-    decompplusspend_table['ci95_hi_share'] = (decompplusspend_table['ci95_hi'] / total_ci95_hi) * 100
+    ci_scale = CI_MULTIPLIER / math.sqrt(sample_size)
+    half_width = np.multiply(x_std, ci_scale)
+    ci95_lo = np.subtract(x_avg, half_width)
+    ci95_hi = np.add(x_avg, half_width, out=half_width)
+    
+    # Join the spend table on 'rn', replacing missing or NaN spend with 0 and keeping the column float64
+    spend_table = total_spend_df.set_index('rn')
+    if not spend_table.index.is_unique:
+        raise ValueError("total_spend_df must contain at most one row per 'rn'.")
+    spend_table = spend_table.reindex(rn_index)
+    spend_columns = {col: spend_table[col].to_numpy() for col in spend_table.columns}
+    spend_columns['Total Spend'] = spend_table['Total Spend'].fillna(0).to_numpy(dtype=np.float64)
+    
+    # Calculate the share of each variable against the column totals in one pass
+    ci_values = np.column_stack([x_avg, ci95_lo, ci95_hi])
+    ci_totals = ci_values.sum(axis=0)
+    shares = ci_values / ci_totals
+    shares *= 100
+    
+    decompplusspend_table = pd.DataFrame({
+        'rn': rn_index,
+        'wtd_avg': x_avg,
+        'wtd_stddev': x_std,
+        'ci95_lo': ci95_lo,
+        'ci95_hi': ci95_hi,
+        **spend_columns,
+        'wtd_avg_share': shares[:, 0],
+        'ci95_lo_share': shares[:, 1],
+        'ci95_hi_share': shares[:, 2]
+    }, copy=False)
+    
+    if return_totals:
+        totals = {'wtd_avg': ci_totals[0], 'ci95_lo': ci_totals[1], 'ci95_hi': ci_totals[2]}
+        return decompplusspend_table, totals
     
     return decompplusspend_table
 
-def calculate_cpa(decompplusspend_table):
+def calculate_cpa(decompplusspend_table, filter_spend=True):
     """
     Calculate Cost per Acquisition (CPA) metrics for paid media spends.
     
     Parameters:
     - decompplusspend_table (DataFrame): Table with decomposed effects and spend data.
+    - filter_spend (bool): Drop rows where 'Total Spend' is zero. Set to False if the table
+      is already filtered. Default is True.
     
     Returns:
     - DataFrame: Table with CPA metrics.
     """
-    decompplusspend_table['cpa_wtd_avg'] = decompplusspend_table['Total Spend'] / decompplusspend_table['wtd_avg']
-    decompplusspend_table['cpa_ci95_lo'] = decompplusspend_table['Total Spend'] / decompplusspend_table['ci95_lo']
-    decompplusspend_table['cpa_ci95_hi'] = decompplusspend_table['Total Spend'] / decompplusspend_table['ci95_hi']
+    spend = decompplusspend_table['Total Spend'].to_numpy(dtype=np.float64)
+    
+    # Filter out rows where 'Total Spend' is zero before computing the ratios
+    if filter_spend:
+        spend_mask = spend > 0
+        decompplusspend_table = decompplusspend_table[spend_mask]
+        spend = spend[spend_mask]
     
-    # Filter out rows where 'Total Spend' is zero
-    cpa_table = decompplusspend_table[decompplusspend_table['Total Spend'] > 0]
+    # Divide the spend by all three estimates at once, broadcasting the spend column
+    estimates = decompplusspend_table[['wtd_avg', 'ci95_lo', 'ci95_hi']].to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cpa = spend[:, np.newaxis] / estimates
+    
+    # Add the CPA columns to a new table
+    cpa_table = decompplusspend_table.assign(cpa_wtd_avg=cpa[:, 0], cpa_ci95_lo=cpa[:, 1], cpa_ci95_hi=cpa[:, 2])
     
     return cpa_table
 
-def calculate_roi(decompplusspend_table):
+def calculate_roi(decompplusspend_table, filter_spend=True):
     """
     Calculate Return on Investment (ROI) metrics for paid media spends.
     
     Parameters:
     - decompplusspend_table (DataFrame): Table with     decomposed effects and spend data.
+    - filter_spend (bool): Drop rows where 'Total Spend' is zero. Set to False if the table
+      is already filtered. Default is True.
     
     Returns:
     - DataFrame: Table with ROI metrics.
     """
-    decompplusspend_table['roi_wtd_avg'] = decompplusspend_table['wtd_avg'] / decompplusspend_table['Total Spend']
-    decompplusspend_table['roi_ci95_lo'] = decompplusspend_table['ci95_lo'] / decompplusspend_table['Total Spend']
-    decompplusspend_table['roi_ci95_hi'] = decompplusspend_table['ci95_hi'] / decompplusspend_table['Total Spend']
+    spend = decompplusspend_table['Total Spend'].to_numpy(dtype=np.float64)
+    
+    # Filter out rows where 'Total Spend' is zero before computing the ratios
+    if filter_spend:
+        spend_mask = spend > 0
+        decompplusspend_table = decompplusspend_table[spend_mask]
+        spend = spend[spend_mask]
     
-    # Filter out rows where 'Total Spend' is zero
-    roi_table = decompplusspend_table[decompplusspend_table['Total Spend'] > 0]
+    # Divide all three estimates by the spend at once, broadcasting the spend column
+    estimates = decompplusspend_table[['wtd_avg', 'ci95_lo', 'ci95_hi']].to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        roi = estimates / spend[:, np.newaxis]
+    
+    # Add the ROI columns to a new table
+    roi_table = decompplusspend_table.assign(roi_wtd_avg=roi[:, 0], roi_ci95_lo=roi[:, 1], roi_ci95_hi=roi[:, 2])
     
     return roi_table
 
-def calculate_contributions(decompplusspend_table):
+def calculate_contributions(decompplusspend_table, totals=None):
     """
     Calculate contributions share for each variable.
     
     Parameters:
     - decompplusspend_table (DataFrame): Table with decomposed effects and spend data.
+    - totals (dict): Precomputed totals of 'wtd_avg', 'ci95_lo' and 'ci95_hi', as returned by
+      compute_contributions(..., return_totals=True). Computed from the table if None.
     
     Returns:
     - DataFrame: Table with contributions share.
     """
-    # Calculate totals for weighted average, ci95_lo, and ci95_hi
-    total_wtd_avg = decompplusspend_table['wtd_avg'].sum()
-    total_ci95_lo = decompplusspend_table['ci95_lo'].sum()
-    total_ci95_hi = decompplusspend_table['ci95_hi'].sum()
-    
-    # Calculate the share of each variable
-    decompplusspend_table['wtd_avg_share'] = (decompplusspend_table['wtd_avg'] / total_wtd_avg) * 100
-    decompplusspend_table['ci95_lo_share'] = (decompplusspend_table['ci95_lo'] / total_ci95_lo) * 100
-    decompplusspend_table['ci95_hi_share'] = (decompplusspend_table['ci95_hi'] / total_ci95_hi) * 100
+    # Calculate the share of each variable against the column totals in one pass
+    ci_values = decompplusspend_table[['wtd_avg', 'ci95_lo', 'ci95_hi']].to_numpy(dtype=np.float64)
+    if totals is None:
+        ci_totals = ci_values.sum(axis=0)
+    else:
+        ci_totals = np.array([totals['wtd_avg'], totals['ci95_lo'], totals['ci95_hi']])
+    shares = ci_values / ci_totals
+    shares *= 100
     
     # Create a new table for contributions share
-    contributions_share_table = decompplusspend_table[['rn', 'wtd_avg_share', 'ci95_lo_share', 'ci95_hi_share']]
+    contributions_share_table = pd.DataFrame({
+        'rn': decompplusspend_table['rn'].to_numpy(),
+        'wtd_avg_share': shares[:, 0],
+        'ci95_lo_share': shares[:, 1],
+        'ci95_hi_share': shares[:, 2]
+    }, index=decompplusspend_table.index, copy=False)
     
     return contributions_share_table
 
@@ -148,13 +266,19 @@ def calculate_pseudo_r_squared(data, dep_var_col, dep_var_hat_col, sample_size,
     Returns:
     - tuple: Pseudo R-squared and adjusted pseudo R-squared.
     """
-    data['avg_dep_var'] = data[dep_var_col].mean()
+    y = data[dep_var_col].to_numpy(dtype=np.float64)
+    y_hat = data[dep_var_hat_col].to_numpy(dtype=np.float64)
     
-    # Calculate sum of squared residuals (SSR) and total sum of squares (TSS)
-    data['ssr'] = (data[dep_var_col] - data[dep_var_hat_col]).pow(2)
-    data['tss'] = (data[dep_var_col] - data['avg_dep_var']).pow(2)
+    # Calculate sum of squared residuals (SSR) and total sum of squares (TSS),
+    # skipping NaN like the pandas sums did
+    residuals = y - y_hat
+    residuals = residuals[~np.isnan(residuals)]
+    ssr = float(residuals @ residuals)
+    y = y[~np.isnan(y)]
+    deviations = y - y.mean()
+    tss = float(deviations @ deviations)
     
-    pseudo_r_sqd = 1 - (data['ssr'].sum() / data['tss'].sum())
+    pseudo_r_sqd = 1 - (ssr / tss)
     
     degrees_of_freedom_pseudo = sample_size - num_hyperparameters - num_betas
     pseudo_r_sqd_adj = 1 - (((1 - pseudo_r_sqd) * (sample_size - 1)) / degrees_of_freedom_pseudo)
@@ -185,16 +309,19 @@ if __name__ == "__main__":
     
     sample_size = 100
     
-    decompplusspend_table = compute_contributions(decomp_table, total_spend_df, sample_size)
+    decompplusspend_table, totals = compute_contributions(decomp_table, total_spend_df, sample_size, return_totals=True)
     print(decompplusspend_table.head())
     
-    cpa_table = calculate_cpa(decompplusspend_table)
+    # Filter out zero-spend rows once and share the result between CPA and ROI
+    spend_table = decompplusspend_table[decompplusspend_table['Total Spend'].to_numpy() > 0]
+    
+    cpa_table = calculate_cpa(spend_table, filter_spend=False)
     print(cpa_table.head())
     
-    roi_table = calculate_roi(decompplusspend_table)
+    roi_table = calculate_roi(spend_table, filter_spend=False)
     print(roi_table.head())
     
-    contributions_share_table = calculate_contributions(decompplusspend_table)
+    contributions_share_table = calculate_contributions(decompplusspend_table, totals)
     print(contributions_share_table.head())
     
     # Assuming data, dep_var_col, dep_var_hat_col, num_hyperparameters, and num_betas are defined elsewhere
@@ -17,6 +17,12 @@ EXAMPLES_DIR = os.path.join(BASE_DIR, '..', 'examples')
 # Directory for storing test files
 TESTS_DIR = os.path.join(BASE_DIR, '..', 'tests')
 
+# Directory for caching downloaded files (e.g. the variable dictionary), in the user cache directory
+CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'model_averaging_tool')
+
+# Maximum age in seconds of a cached download before it is fetched again
+CACHE_MAX_AGE = 24 * 60 * 60
+
 # Configuration for logging
 LOGGING_CONFIG = {
     'version': 1,
@@ -56,6 +62,9 @@ PLOT_CONFIG = {
     'color_palette': 'husl'
 }
 
+# Whether plotting functions display figures after saving them (set to 0 for batch runs)
+SHOW_PLOTS = os.environ.get('MODEL_AVERAGING_SHOW_PLOTS', '1') != '0'
+
 # Configuration for data processing
 DATA_PROCESSING_CONFIG = {
     'date_format': '%d/%m/%Y/',
@@ -70,9 +79,12 @@ if __name__ == "__main__":
     print(f"Output Directory: {OUTPUT_DIR}")
     print(f"Examples Directory: {EXAMPLES_DIR}")
     print(f"Tests Directory: {TESTS_DIR}")
+    print(f"Cache Directory: {CACHE_DIR}")
+    print(f"Cache Max Age: {CACHE_MAX_AGE}")
     print(f"Raw Data Path: {RAW_DATA_PATH}")
     print(f"Pareto Aggregated Path: {PARETO_AGGREGATED_PATH}")
     print(f"Pareto AllDecomp Matrix Path: {PARETO_ALLDECOMP_MATRIX_PATH}")
     print(f"Dictionary URL: {DICTIONARY_URL}")
     print(f"Plot Config: {PLOT_CONFIG}")
+    print(f"Show Plots: {SHOW_PLOTS}")
     print(f"Data Processing Config: {DATA_PROCESSING_CONFIG}")
\ No newline at end of file
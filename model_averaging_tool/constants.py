@@ -19,6 +19,9 @@ OPTION_DROP = "drop"
 # Default encoding for reading CSV files
 DEFAULT_ENCODING = 'utf-8'
 
+# Columns of the Pareto aggregated file used downstream
+PARETO_AGGREGATED_COLUMNS = ['solID', 'rsq_train', 'nrmse', 'rn', 'coef', 'xDecompAgg', 'weights']
+
 # Confidence interval multiplier (95% confidence interval)
 CI_MULTIPLIER = 1.96
 
@@ -60,6 +63,7 @@ if __name__ == "__main__":
     print(f"Option Keep: {OPTION_KEEP}")
     print(f"Option Drop: {OPTION_DROP}")
     print(f"Default Encoding: {DEFAULT_ENCODING}")
+    print(f"Pareto Aggregated Columns: {PARETO_AGGREGATED_COLUMNS}")
     print(f"Confidence Interval Multiplier: {CI_MULTIPLIER}")
     print(f"Prophet Variables Options: {PROPHET_VARS_OPTS}")
     print(f"Prophet Signs Options: {PROPHET_SIGNS_OPTS}")
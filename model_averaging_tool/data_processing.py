@@ -1,7 +1,21 @@
 # model_averaging_tool/data_processing.py
 
-import pandas as pd
+import os
 import json
+import time
+import pickle
+import hashlib
+import functools
+import pandas as pd
+import numpy as np
+from pathlib import Path
+from .config import CACHE_DIR, CACHE_MAX_AGE
+from .constants import PARETO_AGGREGATED_COLUMNS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 def load_json(file_path):
     """
@@ -13,8 +27,33 @@ def load_json(file_path):
     Returns:
     - dict: Parsed JSON data.
     """
-    with open(file_path, 'r') as file:
-        return json.load(file)
+    data = Path(file_path).read_bytes()
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson rejects NaN/Infinity and integers wider than 64 bits, which json accepts
+            pass
+    return json.loads(data)
+
+def _read_csv_fast(file_path, **kwargs):
+    """
+    Read a CSV file with the multithreaded pyarrow parser, falling back to the C parser.
+    
+    Only use this for files with a known schema. pyarrow parses ISO date columns into dates, and
+    leaves invalid UTF-8 as bytes unless the text columns are declared as str in dtype.
+    
+    Parameters:
+    - file_path (str): Path to the CSV file.
+    - **kwargs: Additional keyword arguments passed to pandas.read_csv.
+    
+    Returns:
+    - DataFrame: Loaded data.
+    """
+    try:
+        return pd.read_csv(file_path, engine='pyarrow', **kwargs)
+    except ImportError:
+        return pd.read_csv(file_path, **kwargs)
 
 def read_csv(file_path, encoding='utf-8'):
     """
@@ -33,6 +72,103 @@ def read_csv(file_path, encoding='utf-8'):
         print(f"Error reading the file: {file_path}")
         return None
 
+def _parse_variable_mapping(dictionary_url):
+    """
+    Parse the variable mapping from a dictionary CSV file.
+    
+    Parameters:
+    - dictionary_url (str): URL, path or file-like object of the dictionary CSV file.
+    
+    Returns:
+    - Series: Display name of each variable, indexed by variable name.
+    """
+    dictionary = _read_csv_fast(dictionary_url, usecols=['variable', 'mapping'], dtype=str)
+    # Keep the last entry of duplicated variables, as a dict would
+    dictionary = dictionary.drop_duplicates('variable', keep='last')
+    return dictionary.set_index('variable')['mapping']
+
+@functools.lru_cache(maxsize=8)
+def _read_variable_mapping(dictionary_url, mtime):
+    """
+    Read the variable mapping from a dictionary CSV file, caching the result.
+    
+    The parsed mapping is memoized per process. Downloads are also pickled as a dict under
+    CACHE_DIR so that later runs reuse them until they are older than CACHE_MAX_AGE.
+    
+    Parameters:
+    - dictionary_url (str): http(s) URL or path to the dictionary CSV file.
+    - mtime (float): Modification time of a local file, part of the cache key. None for URLs.
+    
+    Returns:
+    - Series: Display name of each variable, indexed by variable name.
+    """
+    cache_path = None
+    if mtime is None:
+        cache_path = os.path.join(CACHE_DIR, hashlib.sha1(dictionary_url.encode('utf-8')).hexdigest() + '.pkl')
+        try:
+            if time.time() - os.path.getmtime(cache_path) < CACHE_MAX_AGE:
+                with open(cache_path, 'rb') as file:
+                    mapping = pickle.load(file)
+                return pd.Series(mapping, name='mapping').rename_axis('variable')
+        except Exception:
+            # Any unreadable cache file (missing, stale format, other library versions) is a miss
+            pass
+
+    variable_mapping = _parse_variable_mapping(dictionary_url)
+
+    if cache_path is not None:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(cache_path, 'wb') as file:
+                pickle.dump(variable_mapping.to_dict(), file)
+        except OSError as e:
+            print(f"Could not cache the dictionary: {e}")
+
+    return variable_mapping
+
+def _load_variable_mapping(dictionary_url):
+    """
+    Load the variable mapping from a dictionary CSV file.
+    
+    Local files are cached on their modification time, so edits are picked up on the next call.
+    http(s) URLs are cached per process and on disk. Anything else (other URL schemes,
+    file-like objects) is read on every call.
+    
+    Parameters:
+    - dictionary_url (str): URL, path or file-like object of the dictionary CSV file.
+    
+    Returns:
+    - Series: Display name of each variable, indexed by variable name. A copy, so callers may modify it.
+    """
+    if isinstance(dictionary_url, (str, os.PathLike)) and os.path.isfile(dictionary_url):
+        return _read_variable_mapping(dictionary_url, os.path.getmtime(dictionary_url)).copy()
+    if isinstance(dictionary_url, str) and dictionary_url.startswith(('http://', 'https://')):
+        return _read_variable_mapping(dictionary_url, None).copy()
+    return _parse_variable_mapping(dictionary_url)
+
+def _read_pareto_aggregated(pareto_aggregated_path):
+    """
+    Read only the Pareto aggregated columns used downstream.
+    
+    Parameters:
+    - pareto_aggregated_path (str): Path, URL or file-like object of the Pareto aggregated CSV file.
+    
+    Returns:
+    - DataFrame: The columns of PARETO_AGGREGATED_COLUMNS present in the file, in that order.
+    """
+    # Declaring the text columns keeps invalid UTF-8 raising UnicodeDecodeError under the pyarrow engine
+    dtype = {'solID': str, 'rn': str}
+    try:
+        return _read_csv_fast(pareto_aggregated_path, usecols=PARETO_AGGREGATED_COLUMNS, dtype=dtype)
+    except UnicodeDecodeError:
+        raise
+    except (KeyError, ValueError):
+        # Some columns are missing: parse the whole file and keep the ones present
+        if hasattr(pareto_aggregated_path, 'seek'):
+            pareto_aggregated_path.seek(0)
+        pareto_aggregated = _read_csv_fast(pareto_aggregated_path, dtype=dtype)
+        return pareto_aggregated[[col for col in PARETO_AGGREGATED_COLUMNS if col in pareto_aggregated.columns]]
+
 def preprocess_data(raw_data_path, pareto_aggregated_path, pareto_alldecomp_matrix_path, dictionary_url):
     """
     Preprocess data by reading raw data and renaming variables using a dictionary.
@@ -49,33 +185,40 @@ def preprocess_data(raw_data_path, pareto_aggregated_path, pareto_alldecomp_matr
     # Try reading the files
     try:
         raw_data = pd.read_csv(raw_data_path)
-        pareto_aggregated = pd.read_csv(pareto_aggregated_path)
+        pareto_aggregated = _read_pareto_aggregated(pareto_aggregated_path)
         pareto_alldecomp_matrix = pd.read_csv(pareto_alldecomp_matrix_path)
     except UnicodeDecodeError as e:
         print(f"Error reading the file: {e}")
         return None, None, None
 
     # Load the dictionary
-    dictionary = pd.read_csv(dictionary_url)
-    variable_mapping = dictionary.set_index('variable')['mapping'].to_dict()
+    variable_mapping = _load_variable_mapping(dictionary_url)
 
     # Rename variables in pareto_aggregated
     pareto_aggregated['rn'] = pareto_aggregated['rn'].replace("(Intercept)", "intercept")
     exceptions_agg = ["intercept", "holiday", "trend", "season"]
-    pareto_aggregated['rn'] = pareto_aggregated['rn'].apply(lambda x: variable_mapping.get(x.lower(), x) if x.lower() not in exceptions_agg else x)
+    rn = pareto_aggregated['rn']
+    rn_lower = rn.str.lower()
+    mapped_rn = rn_lower.map(variable_mapping).fillna(rn)
+    pareto_aggregated['rn'] = rn.where(rn_lower.isin(exceptions_agg), mapped_rn)
 
     # Rename variables in pareto_alldecomp_matrix
     exceptions_matrix = ["solID", "xDecompAgg", "depVarHat", "holiday", "trend", "season", "ds", "top_sol", "cluster", "intercept"]
-    pareto_alldecomp_matrix.columns = [variable_mapping.get(col.lower(), col) if col.lower() not in exceptions_matrix else col for col in pareto_alldecomp_matrix.columns]
+    columns = pareto_alldecomp_matrix.columns
+    columns_lower = columns.str.lower()
+    mapped_columns = columns_lower.map(variable_mapping)
+    keep_columns = columns_lower.isin(exceptions_matrix) | mapped_columns.isna()
 
-    # Convert column names of pareto_alldecomp_matrix to upper case
-    pareto_alldecomp_matrix.columns = pareto_alldecomp_matrix.columns.str.upper()
+    # Convert column names of pareto_alldecomp_matrix to upper case after the lookup
+    pareto_alldecomp_matrix.columns = pd.Index(np.where(keep_columns, columns, mapped_columns)).str.upper()
 
     # Convert all column names in raw_data to upper case
     raw_data.columns = raw_data.columns.str.upper()
 
-    # Convert all entries in the "rn" column of pareto_aggregated to upper case
-    pareto_aggregated['rn'] = pareto_aggregated['rn'].str.upper()
+    # Convert all entries in the "rn" column of pareto_aggregated to upper case,
+    # upper-casing each distinct name once and expanding back through the codes
+    rn_codes, rn_uniques = pd.factorize(pareto_aggregated['rn'])
+    pareto_aggregated['rn'] = rn_uniques.str.upper().take(rn_codes, allow_fill=True, fill_value=np.nan)
 
     return raw_data, pareto_aggregated, pareto_alldecomp_matrix
 
@@ -92,12 +235,21 @@ def filter_data_by_date(data, date_column, window_start, window_end):
     Returns:
     - DataFrame: Filtered data.
     """
-    # Convert to datetime format
-    data[date_column] = pd.to_datetime(data[date_column])
+    # Convert to datetime format unless the column is already parsed
+    dates = data[date_column]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, cache=True)
+        data[date_column] = dates
     window_start = pd.to_datetime(window_start, format="%Y-%m-%d")
     window_end = pd.to_datetime(window_end, format="%Y-%m-%d")
-    # Filter the data
-    filtered_data = data[(data[date_column] >= window_start) & (data[date_column] <= window_end)]
+    
+    # Slice sorted data by binary search, otherwise fall back to a boolean mask
+    if dates.is_monotonic_increasing:
+        lo = dates.searchsorted(window_start, side='left')
+        hi = dates.searchsorted(window_end, side='right')
+        filtered_data = data.iloc[lo:hi]
+    else:
+        filtered_data = data[(dates >= window_start) & (dates <= window_end)]
     
     return filtered_data
 
@@ -113,11 +265,11 @@ def rename_columns_using_dictionary(data, dictionary_url):
     - DataFrame: Data with renamed columns.
     """
     # Load the dictionary
-    dictionary = pd.read_csv(dictionary_url)
-    variable_mapping = dictionary.set_index('variable')['mapping'].to_dict()
+    variable_mapping = _load_variable_mapping(dictionary_url)
 
     # Rename columns using the dictionary
-    data.columns = [variable_mapping.get(col.lower(), col) for col in data.columns]
+    mapped_columns = data.columns.str.lower().map(variable_mapping)
+    data.columns = np.where(mapped_columns.isna(), data.columns, mapped_columns)
     
     return data
 
@@ -144,12 +296,15 @@ def determine_data_frequency(data, date_column):
     Returns:
     - str: Data frequency ('W' for weekly, 'D' for daily, 'irregular' otherwise).
     """
-    date_diff = data[date_column].diff().dt.days.dropna()
+    values = data[date_column].to_numpy(dtype='datetime64[ns]').view('i8')
+    if len(values) < 2:
+        return 'irregular'
     
-    if (date_diff == 7).all():
-        return 'W'
-    elif (date_diff == 1).all():
-        return 'D'
+    # Check the first stride and the overall span before comparing every stride
+    day = 86_400_000_000_000
+    step = values[1] - values[0]
+    if step in (day, 7 * day) and values[-1] - values[0] == step * (len(values) - 1) and np.all(np.diff(values) == step):
+        return 'D' if step == day else 'W'
     else:
         return 'irregular'
 
@@ -164,16 +319,22 @@ def check_missing_dates(data, date_column):
     Returns:
     - list: List of missing dates.
     """
-    date_diff = data[date_column].diff().dt.days.dropna()
+    dates = data[date_column]
+    date_diff = dates.diff().dt.days.dropna()
     
     if (date_diff == 1).all():
-        min_date = data[date_column].min()
-        max_date = data[date_column].max()
+        min_date = dates.min()
+        max_date = dates.max()
+        
+        # One row per day over the whole range means nothing is missing
+        n_expected = int((max_date - min_date) / np.timedelta64(1, 'D')) + 1
+        if n_expected == len(data):
+            return pd.DatetimeIndex([])
         
-        all_dates = pd.date_range(start=min_date, end=max_date, freq='D')
-        missing_dates = all_dates.difference(data[date_column])
+        all_dates = pd.date_range(start=min_date, end=max_date, freq='D').values
+        missing_dates = np.setdiff1d(all_dates, dates.values.astype(all_dates.dtype), assume_unique=True)
         
-        return missing_dates
+        return pd.DatetimeIndex(missing_dates)
     else:
         return []
 
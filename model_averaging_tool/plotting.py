@@ -1,11 +1,99 @@
 # model_averaging_tool/plotting.py
 
-import matplotlib.pyplot as plt
-import seaborn as sns
+import functools
 import pandas as pd
-from prettytable import PrettyTable
-from matplotlib.ticker import AutoMinorLocator
-import matplotlib.dates as mdates
+import numpy as np
+from .config import SHOW_PLOTS
+
+# Extra savefig options per image format; PNGs use a faster zlib level without the optimize pass
+SAVE_KWARGS = {
+    'png': {'pil_kwargs': {'compress_level': 3, 'optimize': False}}
+}
+
+def _error_bars(wtd_avg, ci95_lo, ci95_hi):
+    """
+    Compute asymmetric error bars around a weighted average.
+    
+    Parameters:
+    - wtd_avg (ndarray): Weighted averages.
+    - ci95_lo (ndarray): Lower bounds of the 95% confidence interval.
+    - ci95_hi (ndarray): Upper bounds of the 95% confidence interval.
+    
+    Returns:
+    - ndarray: C-contiguous float64 (2, N) array of lower and upper errors, passed as xerr.
+    """
+    error = np.stack([wtd_avg - ci95_lo, ci95_hi - wtd_avg])
+    return np.abs(np.ascontiguousarray(error, dtype=np.float64))
+
+def _format_date_axis(ax):
+    """
+    Format the x-axis to show date in MM-YYYY format every 3rd month.
+    
+    Parameters:
+    - ax (Axes): Axes whose x-axis is formatted.
+    
+    Returns:
+    - None
+    """
+    import matplotlib.dates as mdates
+    from matplotlib.ticker import AutoMinorLocator
+
+    # Locators and formatters are built per axis: they hold a reference to it and
+    # pick up the current rcParams (timezone, usetex) when created
+    ax.xaxis.set_major_locator(mdates.MonthLocator(interval=3))
+    ax.xaxis.set_minor_locator(AutoMinorLocator())
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%m-%Y'))
+
+def _finalize(fig, image_name, image_format, dpi=None, show=None):
+    """
+    Save a figure and then display it if requested, otherwise close it.
+    
+    Parameters:
+    - fig (Figure): Figure to save.
+    - image_name (str): File name of the saved image.
+    - image_format (str): Format to save the image.
+    - dpi (int): Resolution of the saved image. Default is the matplotlib setting.
+    - show (bool): Display the figure after saving. Default is SHOW_PLOTS.
+    
+    Returns:
+    - None
+    """
+    import matplotlib.pyplot as plt
+
+    fig.savefig(image_name, format=image_format, dpi=dpi, **SAVE_KWARGS.get(image_format, {}))
+
+    if SHOW_PLOTS if show is None else show:
+        plt.show()
+    else:
+        # Release the figure so batch runs do not accumulate open figures
+        plt.close(fig)
+
+@functools.lru_cache(maxsize=32)
+def _make_formatter(cols, dtypes):
+    """
+    Build a row formatter specialized to a DataFrame schema.
+    
+    Parameters:
+    - cols (tuple): Column names.
+    - dtypes (tuple): Column dtypes, aligned with cols.
+    
+    Returns:
+    - function: Maps a DataFrame with this schema to a list of table rows.
+    """
+    # Resolve the per-column formatter once; floats are rounded to two decimal points
+    formatters = ['{:.2f}'.format if pd.api.types.is_float_dtype(dtype) else None for dtype in dtypes]
+
+    def format_rows(df):
+        columns = []
+        for i, formatter in enumerate(formatters):
+            column = df.iloc[:, i]
+            if formatter is not None:
+                column = column.map(formatter)
+            # tolist keeps cells as boxed scalars, e.g. Timestamps rather than numpy datetime64
+            columns.append(column.tolist())
+        return list(zip(*columns))
+
+    return format_rows
 
 def df_to_prettytable(df):
     """
@@ -17,17 +105,17 @@ def df_to_prettytable(df):
     Returns:
     - PrettyTable: Formatted table.
     """
+    from prettytable import PrettyTable
+
     table = PrettyTable()
     table.field_names = df.columns.tolist()
 
-    # Setting alignment for each column to right
-    for field in table.field_names:
-        table.align[field] = "r"
+    # Setting alignment for all columns to right in one assignment
+    table.align = "r"
 
-    for index, row in df.iterrows():
-        # Rounding each value in the row to two decimal points
-        formatted_row = ['{:.2f}'.format(val) if isinstance(val, float) else val for val in row]
-        table.add_row(formatted_row)
+    # Format the rows with the formatter cached for this schema
+    format_rows = _make_formatter(tuple(df.columns), tuple(df.dtypes))
+    table.add_rows(format_rows(df))
     return table
 
 def plot_contributions(contributions_share_table_mod, image_format='png'):
@@ -41,33 +129,29 @@ def plot_contributions(contributions_share_table_mod, image_format='png'):
     Returns:
     - None: Displays and saves the plot.
     """
+    import matplotlib.pyplot as plt
+
     # Check if DataFrame is not empty
     if not contributions_share_table_mod.empty:
         # If 'rn' is a column in the DataFrame, set it as index
         if 'rn' in contributions_share_table_mod.columns:
-            contributions_share_table_mod.set_index('rn', inplace=True)
+            contributions_share_table_mod = contributions_share_table_mod.set_index('rn')
 
         # Calculate the error for error bars
-        error_lower = abs(contributions_share_table_mod['wtd_avg_share'] - contributions_share_table_mod['ci95_lo_share'])
-        error_upper = abs(contributions_share_table_mod['ci95_hi_share'] - contributions_share_table_mod['wtd_avg_share'])
-        error = [error_lower, error_upper]
+        error = _error_bars(contributions_share_table_mod['wtd_avg_share'].to_numpy(dtype=np.float64),
+                            contributions_share_table_mod['ci95_lo_share'].to_numpy(dtype=np.float64),
+                            contributions_share_table_mod['ci95_hi_share'].to_numpy(dtype=np.float64))
 
         # Plotting
-        fig, ax = plt.subplots(figsize=(12, 5))
+        fig, ax = plt.subplots(figsize=(12, 5), layout='constrained')
         contributions_share_table_mod['wtd_avg_share'].plot(kind='barh', ax=ax, alpha=0.9, xerr=error, capsize=2)
 
         ax.set_title('Share of Contribution')
         ax.set_xlabel('Share Percentage (%)')
         ax.set_ylabel('Variables')
 
-        plt.tight_layout()
-
-        # Save the figure to a file
-        image_name = f'share_contribution_graph.{image_format}'
-        fig.savefig(image_name)
-
-        # Display the plot
-        plt.show()
+        # Save the figure to a file and display it
+        _finalize(fig, f'share_contribution_graph.{image_format}', image_format)
     else:
         print("No data available for plotting.")
 
@@ -82,12 +166,14 @@ def plot_roi(roi_table, image_format='png'):
     Returns:
     - None: Displays and saves the plot.
     """
+    import matplotlib.pyplot as plt
+
     if not roi_table.empty:
         # ROI Plot
-        fig, ax = plt.subplots(figsize=(12, 5))
-        error_roi_lower = abs(roi_table['roi_wtd_avg'] - roi_table['roi_ci95_lo'])
-        error_roi_upper = abs(roi_table['roi_ci95_hi'] - roi_table['roi_wtd_avg'])
-        error_roi = [error_roi_lower, error_roi_upper]
+        fig, ax = plt.subplots(figsize=(12, 5), layout='constrained')
+        error_roi = _error_bars(roi_table['roi_wtd_avg'].to_numpy(dtype=np.float64),
+                                roi_table['roi_ci95_lo'].to_numpy(dtype=np.float64),
+                                roi_table['roi_ci95_hi'].to_numpy(dtype=np.float64))
 
         roi_table.plot(x='rn', y='roi_wtd_avg', kind='barh', ax=ax, xerr=error_roi, capsize=4, label='ROI')
         ax.set_title('Return on Investment (ROI)')
@@ -97,9 +183,8 @@ def plot_roi(roi_table, image_format='png'):
         # Display the legend
         ax.legend()
 
-        plt.tight_layout()
-        plt.show()
-        fig.savefig(f'ROI_graph.{image_format}')
+        # Save the figure to a file and display it
+        _finalize(fig, f'ROI_graph.{image_format}', image_format)
 
 def plot_cpa(cpa_table, image_format='png'):
     """
@@ -112,12 +197,14 @@ def plot_cpa(cpa_table, image_format='png'):
     Returns:
     - None: Displays and saves the plot.
     """
+    import matplotlib.pyplot as plt
+
     if not cpa_table.empty:
         # CPA Plot
-        fig, ax = plt.subplots(figsize=(12, 5))
-        error_cpa_lower = abs(cpa_table['cpa_wtd_avg'] - cpa_table['cpa_ci95_lo'])
-        error_cpa_upper = abs(cpa_table['cpa_ci95_hi'] - cpa_table['cpa_wtd_avg'])
-        error_cpa = [error_cpa_lower, error_cpa_upper]
+        fig, ax = plt.subplots(figsize=(12, 5), layout='constrained')
+        error_cpa = _error_bars(cpa_table['cpa_wtd_avg'].to_numpy(dtype=np.float64),
+                                cpa_table['cpa_ci95_lo'].to_numpy(dtype=np.float64),
+                                cpa_table['cpa_ci95_hi'].to_numpy(dtype=np.float64))
 
         cpa_table.plot(x='rn', y='cpa_wtd_avg', kind='barh', ax=ax, xerr=error_cpa, capsize=4, label='CPA')
         ax.set_title('Cost per Acquisition (CPA)')
@@ -127,9 +214,8 @@ def plot_cpa(cpa_table, image_format='png'):
         # Display the legend
         ax.legend()
 
-        plt.tight_layout()
-        plt.show()
-        fig.savefig(f'CPA_graph.{image_format}')
+        # Save the figure to a file and display it
+        _finalize(fig, f'CPA_graph.{image_format}', image_format)
 
 
 def plot_effect_vs_paid_media_spends(best_model_data, paid_media_spends, solID_min_nrmse, image_format='png'):
@@ -145,6 +231,12 @@ def plot_effect_vs_paid_media_spends(best_model_data, paid_media_spends, solID_m
     Returns:
     - None: Displays and saves the plot.
     """
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+    import seaborn as sns
+    from matplotlib.collections import PolyCollection
+    from matplotlib.patches import Patch
+
     # Create a figure and axis
     fig, ax1 = plt.subplots(figsize=(12, 5))
 
@@ -154,42 +246,46 @@ def plot_effect_vs_paid_media_spends(best_model_data, paid_media_spends, solID_m
     # Filter only those channels that exist in best_model_data.columns
     channels_to_plot = [channel for channel in paid_media_spends if channel in best_model_data.columns]
 
-    # Plotting the stacked line chart using `stackplot`
-    ax1.stackplot(best_model_data['DS'],
-                  *[best_model_data[channel] for channel in channels_to_plot],
-                  labels=channels_to_plot, colors=colors, alpha=0.5)
+    # Plotting the stacked area chart as a single PolyCollection, one polygon per channel
+    # Spends are stacked in float32; the extra precision is invisible at plot resolution
+    x = mdates.date2num(best_model_data['DS'])
+    upper = np.cumsum(best_model_data[channels_to_plot].to_numpy(dtype=np.float32).T, axis=0)
+    lower = np.vstack([np.zeros((1, len(x))), upper[:-1]])
+    verts = [np.column_stack([np.concatenate([x, x[::-1]]), np.concatenate([hi, lo[::-1]])])
+             for hi, lo in zip(upper, lower)]
+    channel_colors = colors[:len(channels_to_plot)]
+    stack = PolyCollection(verts, facecolors=channel_colors, edgecolors='none', alpha=0.5)
+    stack.sticky_edges.y.append(0)
+    ax1.add_collection(stack)
+    ax1.xaxis_date()
+    ax1.autoscale()
+    legend_handles = [Patch(facecolor=color, alpha=0.5, label=channel) for channel, color in zip(channels_to_plot, channel_colors)]
 
     # Format x-axis to show date in MM-YYYY format every 3rd month
-    ax1.xaxis.set_major_locator(mdates.MonthLocator(interval=3))
-    ax1.xaxis.set_minor_locator(AutoMinorLocator())
+    _format_date_axis(ax1)
 
     # Rotate x-axis dates by 45 degrees
     plt.xticks(rotation=45)
 
     # Create a second y-axis
     ax2 = ax1.twinx()
-    ax2.plot(best_model_data['DS'], best_model_data['DEP_VAR'], color='#002147', linewidth=2)
+    ax2.plot(x, best_model_data['DEP_VAR'].to_numpy(dtype=np.float64), color='#002147', linewidth=2)
 
     # Set plot title and labels
     ax1.set_title('Paid Media Spends vs Effect')
     ax1.set_xlabel('Date')
-    ax1.xaxis.set_major_formatter(mdates.DateFormatter('%m-%Y'))
     ax1.set_ylabel('Paid Media Spends')
     ax2.set_ylabel('Dependent Variable')
 
     # Make the legend with smaller font and smaller box
     # Place the legend to the right of the plot
-    ax1.legend(loc='center left', bbox_to_anchor=(1.1, 0.5), prop={'size': 8})
+    ax1.legend(handles=legend_handles, loc='center left', bbox_to_anchor=(1.1, 0.5), prop={'size': 8})
 
     # Adjust the space on the right side for the legend
     plt.subplots_adjust(right=0.75)
 
-    # Save the figure to a file
-    image_name = f'plot_effect_vs_paid_media_spends.{image_format}'
-    fig.savefig(image_name, format=image_format, dpi=300)
-
-    # Display the plot
-    plt.show()
+    # Save the figure to a file and display it
+    _finalize(fig, f'plot_effect_vs_paid_media_spends.{image_format}', image_format, dpi=300)
 
 def plot_depvar_vs_depvarhat(best_model_data, dep_var_col, dep_var_hat_col, best_model_R2_percentage, best_model_NRMSE_percentage, image_format='png'):
     """
@@ -206,17 +302,18 @@ def plot_depvar_vs_depvarhat(best_model_data, dep_var_col, dep_var_hat_col, best
     Returns:
     - None: Displays and saves the plot.
     """
+    import matplotlib.pyplot as plt
+
     # Create a figure and axis with larger width
     fig, ax1 = plt.subplots(figsize=(12, 5))
 
-    # Plot dep_var and depVarHat
-    ax1.plot(best_model_data['DS'], best_model_data[dep_var_col], color='#5778a4', linewidth=2, label='Response variable')
-    ax1.plot(best_model_data['DS'], best_model_data[dep_var_hat_col], color='#d1615d', label='Model fitted')
+    # Plot dep_var and depVarHat, handing matplotlib plain arrays
+    ds = best_model_data['DS'].to_numpy()
+    ax1.plot(ds, best_model_data[dep_var_col].to_numpy(dtype=np.float64), color='#5778a4', linewidth=2, label='Response variable')
+    ax1.plot(ds, best_model_data[dep_var_hat_col].to_numpy(dtype=np.float64), color='#d1615d', label='Model fitted')
 
     # Format x-axis to show date in MM-YYYY format every 3rd month
-    ax1.xaxis.set_major_locator(mdates.MonthLocator(interval=3))
-    ax1.xaxis.set_minor_locator(AutoMinorLocator())
-    ax1.xaxis.set_major_formatter(mdates.DateFormatter('%m-%Y'))
+    _format_date_axis(ax1)
 
     # Rotate x-axis dates by 45 degrees
     plt.xticks(rotation=45)
@@ -237,13 +334,8 @@ def plot_depvar_vs_depvarhat(best_model_data, dep_var_col, dep_var_hat_col, best
     # Place the legend to the right of the plot
     ax1.legend(loc='center left', bbox_to_anchor=(1.0, 0.5), prop={'size': 8})
 
-    # Save the figure to a file
-    image_name = f'plot_DepVar_vs_DepVarHat.{image_format}'
-    fig.savefig(image_name, format=image_format, dpi=300)
-
-    # Display the plot
-    plt.tight_layout()
-    plt.show()
+    # Save the figure to a file and display it
+    _finalize(fig, f'plot_DepVar_vs_DepVarHat.{image_format}', image_format, dpi=300)
 
 def plot_trend_season_holiday(best_model_data, variables=['TREND', 'SEASON', 'HOLIDAY'], image_format='png'):
     """
@@ -257,29 +349,30 @@ def plot_trend_season_holiday(best_model_data, variables=['TREND', 'SEASON', 'HO
     Returns:
     - None: Displays and saves the plots.
     """
-    from sklearn.preprocessing import MinMaxScaler
-
-    # Create a MinMaxScaler object
-    scaler = MinMaxScaler()
+    import matplotlib.pyplot as plt
 
     # Create a figure with subplots, one for each variable
     fig, axs = plt.subplots(len(variables), figsize=(16, 10))
 
+    # Dates are shared by every subplot
+    ds = best_model_data['DS'].to_numpy()
+
     # Loop over each subplot and each variable
     for ax, var in zip(axs, variables):
-        # Normalize the variable to lie between 0 and 1
-        best_model_data[var] = scaler.fit_transform(best_model_data[[var]])
+        # Normalize the variable to lie between 0 and 1, in float32 as it is only plotted
+        x = best_model_data[var].to_numpy(dtype=np.float32)
+        x_min = np.nanmin(x)
+        rng = np.nanmax(x) - x_min
+        normed = (x - x_min) / rng if rng else np.zeros_like(x)
 
         # Format x-axis to show date in MM-YYYY format every 3rd month
-        ax.xaxis.set_major_locator(mdates.MonthLocator(interval=3))
-        ax.xaxis.set_minor_locator(AutoMinorLocator())
-        ax.xaxis.set_major_formatter(mdates.DateFormatter('%m-%Y'))
+        _format_date_axis(ax)
 
         # Rotate x-axis dates by 45 degrees
         ax.tick_params(axis='x', rotation=45)
 
         # Plot the normalized variable
-        ax.plot(best_model_data['DS'], best_model_data[var], label=var)
+        ax.plot(ds, normed, label=var)
 
         # Set plot title and labels
         ax.set_title(f'{var.capitalize()} over Time')
@@ -292,13 +385,8 @@ def plot_trend_season_holiday(best_model_data, variables=['TREND', 'SEASON', 'HO
     # Adjust the space between subplots
     plt.subplots_adjust(hspace=0.4)
 
-    # Save the figure
-    image_name = f'plot_normed_trend_season_holiday.{image_format}'
-    fig.savefig(image_name, format=image_format, dpi=300)
-
-    # Display the plot
-    plt.tight_layout()
-    plt.show()
+    # Save the figure and display it
+    _finalize(fig, f'plot_normed_trend_season_holiday.{image_format}', image_format, dpi=300)
 
 # Example usage
 if __name__ == "__main__":
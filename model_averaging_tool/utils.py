@@ -14,19 +14,27 @@ def check_nas(df):
     - None: Prints out columns with missing values and their percentages.
     """
     name = getattr(df, 'name', 'DataFrame')
-    na_vals = df.isna().sum()
+    
+    # Select the numeric columns once and reuse their float block for the NA and Inf checks
+    is_numeric = np.array([pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+                           for dtype in df.dtypes], dtype=bool)
+    numeric_block = df.iloc[:, is_numeric].to_numpy(dtype=np.float64, na_value=np.nan)
+    
+    na_counts = np.empty(len(df.columns), dtype=np.int64)
+    na_counts[is_numeric] = np.isnan(numeric_block).sum(axis=0)
+    na_counts[~is_numeric] = df.iloc[:, ~is_numeric].isna().to_numpy().sum(axis=0)
+    na_vals = pd.Series(na_counts, index=df.columns)
     na_vals = na_vals[na_vals > 0]  # Filter for variables with missing values greater than zero
     
     if len(na_vals) > 0:
         na_vals_percentage = ((na_vals / len(df)) * 100).round(2)  # Round off to two decimal places
-        strs = [f"{var} ({missing} | {missingness}%)"
-                for var, missing, missingness in zip(na_vals.index, na_vals, na_vals_percentage)]
+        strs = (na_vals.index.to_series().astype(str) + " (" + na_vals.astype(str)
+                + " | " + na_vals_percentage.astype(str) + "%)")
         print(f"Dataset {name} contains missing (NA) values. "
               f"These values must be removed or fixed for proper functioning.\n  Missing values: "
               f"{', '.join(strs)}")
     
-    numeric_columns = df.select_dtypes(include=[np.number]).columns.tolist()
-    have_inf = df[numeric_columns].apply(lambda x: np.isinf(x).sum())
+    have_inf = pd.Series(np.isinf(numeric_block).sum(axis=0), index=df.columns[is_numeric])
     
     if any(have_inf > 0):
         print(f"Dataset {name} contains Inf values. "
@@ -43,7 +51,20 @@ def check_novar(dt_input):
     Returns:
     - None: Prints out columns with no variance.
     """
-    novar = dt_input.loc[:, dt_input.apply(lambda x: x.nunique() == 1)].columns
+    is_numeric = dt_input.columns.isin(dt_input.select_dtypes(include=[np.number]).columns)
+    no_variance = np.zeros(len(dt_input.columns), dtype=bool)
+    
+    # Numeric columns have no variance when their range is zero (NaN-aware, like nunique);
+    # reducing in each column's own dtype keeps integers above 2**53 distinct
+    if is_numeric.any():
+        numeric = dt_input.loc[:, is_numeric]
+        no_variance[is_numeric] = (numeric.max() == numeric.min()).to_numpy(dtype=bool, na_value=False)
+    
+    # Other columns fall back to counting distinct values
+    if not is_numeric.all():
+        no_variance[~is_numeric] = (dt_input.loc[:, ~is_numeric].nunique() == 1).to_numpy()
+    
+    novar = dt_input.columns[no_variance]
     if len(novar) > 0:
         msg = f"There are {len(novar)} column(s) with no-variance: {', '.join(novar)}. \nConsider removing the variable(s) to proceed..."
         print(msg)
@@ -60,15 +81,20 @@ def check_daterange(date_min, date_max, dates):
     Returns:
     - None: Prints warnings if the provided date range is outside the dataset's date range.
     """
+    # Reduce the dates once on the underlying datetime64 values
+    dates = pd.to_datetime(dates, errors='coerce')
+    dates_min = dates.min()
+    dates_max = dates.max()
+    
     if date_min is not None:
         date_min = pd.to_datetime(date_min)
-        if date_min < min(dates):
-            print(f"Parameter 'date_min' not in your data's date range. Changed to '{min(dates)}'")
+        if date_min < dates_min:
+            print(f"Parameter 'date_min' not in your data's date range. Changed to '{dates_min}'")
     
     if date_max is not None:
         date_max = pd.to_datetime(date_max)
-        if date_max > max(dates):
-            print(f"Parameter 'date_max' not in your data's date range. Changed to '{max(dates)}'")
+        if date_max > dates_max:
+            print(f"Parameter 'date_max' not in your data's date range. Changed to '{dates_max}'")
 
 def check_depvar(dt_input, dep_var, dep_var_type):
     """
@@ -149,10 +175,10 @@ def identify_date_column(data):
     Returns:
     - str: Name of the date column.
     """
-    for column in data.columns:
-        if column.lower() == 'date':
-            return column
-    raise ValueError("No date column found.")
+    is_date = np.asarray(data.columns.str.lower() == 'date')
+    if not is_date.any():
+        raise ValueError("No date column found.")
+    return data.columns[is_date.argmax()]
 
 # Example usage
 if __name__ == "__main__":
@@ -14,7 +14,6 @@ setup(
         'numpy',
         'matplotlib',
         'seaborn',
-        'scikit-learn',
         'prettytable',
         'jupyter',
         'notebook'
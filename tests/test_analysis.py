@@ -0,0 +1,47 @@
+# tests/test_analysis.py
+
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from model_averaging_tool import analysis
+
+
+class ComputeContributionsNaNTest(unittest.TestCase):
+    def setUp(self):
+        self.decomp_table = pd.DataFrame({
+            'rn': ['search', 'search', 'tv', 'tv', 'social'],
+            'coef': [1.0, 2.0, 3.0, 4.0, 5.0],
+            'xDecompAgg': [np.nan, 5.0, 3.0, 4.0, 7.0],
+            'weights': [0.2, 0.3, 0.1, 0.3, 0.1]
+        })
+        self.total_spend_df = pd.DataFrame({
+            'rn': ['search', 'tv'],
+            'Total Spend': [100.0, 200.0]
+        })
+
+    def test_nan_propagates_in_pandas_path(self):
+        with mock.patch.object(analysis, 'njit', None):
+            table = analysis.compute_contributions(self.decomp_table, self.total_spend_df, 50)
+
+        search = table.set_index('rn').loc['search']
+        self.assertTrue(np.isnan(search['wtd_avg']))
+        self.assertTrue(np.isnan(search['wtd_stddev']))
+
+        tv = self.decomp_table[self.decomp_table['rn'] == 'tv']
+        expected = np.average(tv['xDecompAgg'], weights=tv['weights'])
+        self.assertAlmostEqual(table.set_index('rn').loc['tv', 'wtd_avg'], expected)
+
+    @unittest.skipIf(analysis.njit is None, "numba is not installed")
+    def test_numba_and_pandas_paths_agree_on_nan_input(self):
+        numba_table = analysis.compute_contributions(self.decomp_table, self.total_spend_df, 50)
+        with mock.patch.object(analysis, 'njit', None):
+            pandas_table = analysis.compute_contributions(self.decomp_table, self.total_spend_df, 50)
+
+        pd.testing.assert_frame_equal(numba_table, pandas_table)
+
+
+if __name__ == '__main__':
+    unittest.main()